@@ -3,12 +3,18 @@ import logging
 from logging.handlers import TimedRotatingFileHandler
 import asyncio
 import random
+import itertools
+from datetime import datetime, timedelta, timezone
+from io import BytesIO
+from typing import Optional
 from dotenv import load_dotenv
 
+import aiohttp
 from tweepy.asynchronous import AsyncClient
 from tweepy import OAuth1UserHandler, API
-from pymongo import MongoClient
-from gridfs import GridFS
+from pymongo import ReturnDocument
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorGridFSBucket
+from gridfs.errors import NoFile
 from bson.objectid import ObjectId
 
 logging.basicConfig(
@@ -33,25 +39,61 @@ ACCESS_SECRET = os.getenv("ACCESS_SECRET")
 BEARER_TOKEN = os.getenv("BEARER_TOKEN")
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
 
-mongo_client = MongoClient(MONGO_URI)
+# Each run is short-lived and only issues a handful of sequential queries.
+# connect=True starts server discovery now, while the rest of startup runs,
+# instead of on the first query (Motor defaults to connect=False).
+mongo_client = AsyncIOMotorClient(
+    MONGO_URI,
+    maxPoolSize=2,
+    minPoolSize=1,
+    serverSelectionTimeoutMS=2000,
+    connect=True,
+    appname="twitter_bot",
+)
 db = mongo_client["twitter_db"]
 tweets_collection = db[os.getenv("tweets_collection")]
 posted_tweets_collection = db[os.getenv("posted_tweets_collection")]
 
-def get_image_from_gridfs(image_id: str) -> bytes:
+# Twitter clients are created lazily and reused across jobs
+_v1_client: Optional[API] = None
+_v2_client: Optional[AsyncClient] = None
+_v2_client_lock = asyncio.Lock()
+
+# Claims older than this are assumed to belong to a dead run and are retaken
+CLAIM_TIMEOUT = timedelta(minutes=30)
+
+# Base delays (seconds) between post retries, roughly doubling per attempt
+RETRY_BACKOFFS = [1.0, 3.0, 7.0]
+# "Human" pauses between thread parts, drawn once at import and cycled
+HUMAN_DELAYS = itertools.cycle([random.uniform(5, 8) for _ in range(32)])
+
+async def ensure_indexes():
+    """
+    Create the indexes backing the tweet queries (no-op if they exist).
+    Run once at setup time via create_indexes.py, not on every job.
+    """
+    await asyncio.gather(
+        tweets_collection.create_index(
+            [("posted", 1), ("created_at_datetime", -1)]
+        ),
+        posted_tweets_collection.create_index("text"),
+    )
+
+async def get_image_from_gridfs(image_id: str) -> bytes:
     """
     Retrieves an image from GridFS by ID
     """
     try:
-        fs = GridFS(db)
+        fs = AsyncIOMotorGridFSBucket(db)
         # Convert string ID to ObjectId
         object_id = ObjectId(image_id)
-        
-        if not fs.exists(object_id):
-            logger.warning(f"Image {image_id} not found in GridFS")
-            return None
-        
-        return fs.get(object_id).read()
+
+        # Opening the stream already looks the file up, no separate exists check
+        stream = await fs.open_download_stream(object_id)
+        return await stream.read()
+    except NoFile:
+        logger.warning(f"Image {image_id} not found in GridFS")
+        return None
     except Exception as e:
         logger.error(f"Error retrieving image from GridFS: {e}")
         return None
@@ -60,80 +102,121 @@ async def prepare_post_image(image_id):
     """
     Prepare image for posting by retrieving from GridFS and uploading to Twitter.
     """
-    temp_image_path = None
     try:
-        media_id = None
-        
-        if image_id:
-            image_data = get_image_from_gridfs(image_id)
-            if image_data:
-                temp_image_path = f"/tmp/tweet_{image_id}.png"
-                with open(temp_image_path, 'wb') as f:
-                    f.write(image_data)
-            else:
-                logger.warning(f"Skipping image upload for missing image {image_id}")
-                return None
-        
-        if temp_image_path:
-            try:
-                v1_client = auth_v1()
-                if not v1_client:
-                    logger.error("Failed to authenticate with Twitter V1 API")
-                    return None
-                    
-                media = v1_client.media_upload(filename=temp_image_path)
-                media_id = media.media_id
-            finally:
-                if os.path.exists(temp_image_path):
-                    os.remove(temp_image_path)
-        
-        return media_id
+        if not image_id:
+            return None
+
+        image_data = await get_image_from_gridfs(image_id)
+        if not image_data:
+            logger.warning(f"Skipping image upload for missing image {image_id}")
+            return None
+
+        v1_client = auth_v1()
+        if not v1_client:
+            logger.error("Failed to authenticate with Twitter V1 API")
+            return None
+
+        # Tweepy only uses the filename to infer the media type here. The v1.1
+        # upload is a blocking requests call, so keep it off the event loop.
+        media = await asyncio.to_thread(
+            v1_client.media_upload,
+            filename=f"tweet_{image_id}.png",
+            file=BytesIO(image_data),
+        )
+        return media.media_id
     except Exception as e:
         logger.error(f"Error preparing image for tweet: {e}")
-        if temp_image_path and os.path.exists(temp_image_path):
-            os.remove(temp_image_path)
         return None
 
+async def mark_posted(tweet_id):
+    """Mark a claimed tweet as posted and drop its claim."""
+    await tweets_collection.update_one(
+        {"_id": tweet_id},
+        {"$set": {"posted": True}, "$unset": {"claimed_at": ""}},
+    )
+
+async def release_tweet(tweet_id):
+    """Drop the claim made by get_new_tweet so the tweet can be retried."""
+    try:
+        await tweets_collection.update_one(
+            {"_id": tweet_id}, {"$unset": {"claimed_at": ""}}
+        )
+    except Exception as e:
+        logger.error(f"Error releasing tweet {tweet_id}: {e}")
+
 async def get_new_tweet():
-    """Get a tweet from the database."""
+    """
+    Claim an unposted tweet from the database. The claim is a claimed_at
+    timestamp; claims older than CLAIM_TIMEOUT (e.g. from a killed run) are
+    taken over, so a tweet is only marked posted once it has been posted.
+    """
+    tweet_data = None
     try:
-        tweet_data = tweets_collection.find_one(
-            {"posted": False}, sort=[("created_at_datetime", -1)]
+        now = datetime.now(timezone.utc)
+        tweet_data = await tweets_collection.find_one_and_update(
+            {
+                "posted": False,
+                "$or": [
+                    {"claimed_at": None},
+                    {"claimed_at": {"$lt": now - CLAIM_TIMEOUT}},
+                ],
+            },
+            {"$set": {"claimed_at": now}},
+            sort=[("created_at_datetime", -1)],
+            projection={"parts": 1, "image_id": 1},
+            return_document=ReturnDocument.AFTER,
         )
 
         if not tweet_data:
-            print("No unposted tweets found in tweets_collection")
+            logger.info("No unposted tweets found in tweets_collection")
             return None
 
-        for part in tweet_data.get("parts", []):
-            existing_posted_tweet = posted_tweets_collection.find_one(
-                {"text": part}
-            )
-            if existing_posted_tweet:
-                print(
-                    f'Part "{part[:30]}..." already exists in posted_tweets_collection. Skipping tweet...'
+        parts = tweet_data.get("parts") or []
+        existing = set()
+        if parts:
+            # At most len(parts) matches, so fetch them all in the first batch
+            cursor = (
+                posted_tweets_collection.find(
+                    {"text": {"$in": parts}}, projection={"_id": 0, "text": 1}
                 )
-                tweets_collection.update_one(
-                    {"_id": tweet_data["_id"]}, {"$set": {"posted": True}}
-                )
-                return None
+                .batch_size(len(parts))
+                .limit(len(parts))
+            )
+            existing = {doc["text"] async for doc in cursor}
+        if existing:
+            part = next(iter(existing))
+            logger.info(
+                f'Part "{part[:30]}..." already exists in posted_tweets_collection. Skipping tweet...'
+            )
+            await mark_posted(tweet_data["_id"])
+            return None
 
-        return {"parts": tweet_data.get("parts", []), "tweet_id": tweet_data["_id"], "image_id": tweet_data.get("image_id")}
+        return {"parts": parts, "tweet_id": tweet_data["_id"], "image_id": tweet_data.get("image_id")}
     except Exception as e:
-        logging.error(f"Error in get_new_tweet: {str(e)}")
+        logger.error(f"Error in get_new_tweet: {str(e)}")
+        if tweet_data:
+            await release_tweet(tweet_data["_id"])
         return None
 
+async def retry_backoff(attempt):
+    """Sleep before retrying a failed post, backing off exponentially."""
+    delay = RETRY_BACKOFFS[attempt - 1] + random.random() * 0.5
+    logger.info(f"Waiting {delay:.2f} seconds before retry...")
+    await asyncio.sleep(delay)
+
 async def post_tweet(client):
     """Post a tweet using the API v2."""
+    tweet_data = None
     try:
         tweet_data = await get_new_tweet()
-        media_id = None
 
         if tweet_data:
             last_tweet_id = None
-            if "image_id" in tweet_data:
+            media_id = None
+            # The image goes on the first part, so skip it if there are none
+            if tweet_data["parts"] and tweet_data.get("image_id"):
                 media_id = await prepare_post_image(tweet_data["image_id"])
-            
+
             for part in tweet_data["parts"]:
                 attempt = 0
                 post_success = False
@@ -142,7 +225,7 @@ async def post_tweet(client):
                 while attempt < max_attempts and not post_success:
                     attempt += 1
                     try:
-                        print(f"Posting tweet part (attempt {attempt}/{max_attempts})...")
+                        logger.info(f"Posting tweet part (attempt {attempt}/{max_attempts})...")
                         if media_id:
                             new_tweet = await client.create_tweet(
                                 text=part, in_reply_to_tweet_id=last_tweet_id, media_ids=[media_id]
@@ -157,69 +240,85 @@ async def post_tweet(client):
 
                         if new_tweet and tweet_id:
                             last_tweet_id = tweet_id
-                            print(f"Tweet part posted successfully (attempt {attempt})")
+                            logger.info(f"Tweet part posted successfully (attempt {attempt})")
                             post_success = True
-                            human_delay = random.uniform(5, 8)
-                            print(
+                            human_delay = next(HUMAN_DELAYS)
+                            logger.info(
                                 f"Waiting {human_delay:.2f} seconds before next post..."
                             )
                             await asyncio.sleep(human_delay)
                         else:
-                            print(
+                            logger.warning(
                                 f"Tweet post attempt {attempt} failed: No valid tweet ID returned"
                             )
                             if attempt < max_attempts:
-                                print(f"Waiting 10 seconds before retry...")
-                                await asyncio.sleep(10)
+                                await retry_backoff(attempt)
 
                     except Exception as e:
-                        print(f"Error posting tweet (attempt {attempt}): {str(e)}")
+                        logger.warning(f"Error posting tweet (attempt {attempt}): {str(e)}")
                         if attempt < max_attempts:
-                            print(f"Waiting 10 seconds before retry...")
-                            await asyncio.sleep(10)
+                            await retry_backoff(attempt)
 
                 if not post_success:
                     raise Exception(
                         f"Failed to post tweet part after {max_attempts} attempts"
                     )
 
-            tweets_collection.update_one(
-                {"_id": tweet_data["tweet_id"]}, {"$set": {"posted": True}}
-            )
+            await mark_posted(tweet_data["tweet_id"])
 
     except Exception as e:
-        print(f"Error in tweet job: {str(e)}")
+        logger.error(f"Error in tweet job: {str(e)}")
+        if tweet_data:
+            await release_tweet(tweet_data["tweet_id"])
         
 def auth_v1():
+    """Get twitter conn 1.1, reusing the cached client if available."""
+    global _v1_client
+    if _v1_client is not None:
+        return _v1_client
     try:
-        """Get twitter conn 1.1"""
-
         auth = OAuth1UserHandler(API_KEY, API_SECRET)
         auth.set_access_token(
             ACCESS_TOKEN,
             ACCESS_SECRET,
         )
-        return API(auth)
+        _v1_client = API(auth)
+        return _v1_client
     except Exception as e:
         logger.error(f"Error during authentication: {str(e)}")
         return None
     
 async def auth_v2():
-    """Authenticates with the Twitter API v2."""
-    try:
-        client = AsyncClient(
-            bearer_token=BEARER_TOKEN,
-            consumer_key=API_KEY,
-            consumer_secret=API_SECRET,
-            access_token=ACCESS_TOKEN,
-            access_token_secret=ACCESS_SECRET,
-            wait_on_rate_limit=True
-        )
-        logger.info("Authentication successful!")
-        return client
-    except Exception as e:
-        logger.error(f"Error during authentication: {str(e)}")
-        return None
+    """Authenticates with the Twitter API v2, reusing the cached client if available."""
+    global _v2_client
+    async with _v2_client_lock:
+        if _v2_client is not None:
+            return _v2_client
+        try:
+            _v2_client = AsyncClient(
+                bearer_token=BEARER_TOKEN,
+                consumer_key=API_KEY,
+                consumer_secret=API_SECRET,
+                access_token=ACCESS_TOKEN,
+                access_token_secret=ACCESS_SECRET,
+                wait_on_rate_limit=True
+            )
+            # Without a session tweepy opens (and closes) a new one per request
+            _v2_client.session = aiohttp.ClientSession()
+            logger.info("Authentication successful!")
+            return _v2_client
+        except Exception as e:
+            logger.error(f"Error during authentication: {str(e)}")
+            return None
+
+async def close_clients():
+    """Close the HTTP session held by the cached v2 client, if any."""
+    global _v2_client
+    async with _v2_client_lock:
+        session = getattr(_v2_client, "session", None)
+        if session is not None and not session.closed:
+            await session.close()
+        _v2_client = None
 
 
 async def job():
@@ -239,9 +338,11 @@ async def job():
 async def main():
     try:
         await job()
-        print("Job executed successfully")
+        logger.info("Job executed successfully")
     except Exception as e:
-        logging.error(f"Fatal error in main: {str(e)}")
+        logger.error(f"Fatal error in main: {str(e)}")
+    finally:
+        await close_clients()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,14 @@
+import asyncio
+import sys
+from app import ensure_indexes
+
+async def main():
+    try:
+        await ensure_indexes()
+        print("Indexes created successfully")
+    except Exception as e:
+        print(f"Error creating indexes: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    asyncio.run(main())
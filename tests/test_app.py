@@ -0,0 +1,229 @@
+import logging
+import os
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+os.environ.setdefault("tweets_collection", "tweets_test")
+os.environ.setdefault("posted_tweets_collection", "posted_tweets_test")
+
+# Importing app configures logging; keep it from creating twitter_bot.log
+with patch(
+    "logging.handlers.TimedRotatingFileHandler",
+    return_value=logging.NullHandler(),
+):
+    import app
+
+
+class FakeCursor:
+    """Minimal stand-in for a Motor cursor over the given documents."""
+
+    def __init__(self, docs=None, error=None):
+        self.docs = docs or []
+        self.error = error
+
+    def batch_size(self, size):
+        return self
+
+    def limit(self, limit):
+        return self
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        if self.error:
+            raise self.error
+        for doc in self.docs:
+            yield doc
+
+
+class ClaimTestCase(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tweets = MagicMock()
+        self.tweets.find_one_and_update = AsyncMock()
+        self.tweets.update_one = AsyncMock()
+        self.posted = MagicMock()
+        self.posted.find = MagicMock(return_value=FakeCursor())
+
+        for target, value in (
+            ("tweets_collection", self.tweets),
+            ("posted_tweets_collection", self.posted),
+        ):
+            patcher = patch.object(app, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def claim_returns(self, doc):
+        self.tweets.find_one_and_update.return_value = doc
+
+    def assert_marked_posted(self, tweet_id):
+        self.tweets.update_one.assert_awaited_once_with(
+            {"_id": tweet_id},
+            {"$set": {"posted": True}, "$unset": {"claimed_at": ""}},
+        )
+
+    def assert_released(self, tweet_id):
+        self.tweets.update_one.assert_awaited_once_with(
+            {"_id": tweet_id}, {"$unset": {"claimed_at": ""}}
+        )
+
+
+class GetNewTweetTest(ClaimTestCase):
+    async def test_claims_without_marking_posted(self):
+        self.claim_returns({"_id": 1, "parts": ["a", "b"], "image_id": "img"})
+
+        tweet = await app.get_new_tweet()
+
+        self.assertEqual(
+            tweet, {"parts": ["a", "b"], "tweet_id": 1, "image_id": "img"}
+        )
+        query, update = self.tweets.find_one_and_update.await_args.args
+        self.assertFalse(query["posted"])
+        self.assertIn({"claimed_at": None}, query["$or"])
+        self.assertEqual(list(update["$set"]), ["claimed_at"])
+        self.tweets.update_one.assert_not_awaited()
+
+    async def test_no_unposted_tweet(self):
+        self.claim_returns(None)
+
+        self.assertIsNone(await app.get_new_tweet())
+        self.tweets.update_one.assert_not_awaited()
+
+    async def test_duplicate_part_marks_posted(self):
+        self.claim_returns({"_id": 1, "parts": ["a", "b"]})
+        self.posted.find.return_value = FakeCursor([{"text": "b"}])
+
+        self.assertIsNone(await app.get_new_tweet())
+        self.assert_marked_posted(1)
+
+    async def test_null_parts_are_treated_as_empty(self):
+        self.claim_returns({"_id": 1, "parts": None})
+
+        tweet = await app.get_new_tweet()
+
+        self.assertEqual(tweet["parts"], [])
+        self.posted.find.assert_not_called()
+
+    async def test_error_after_claim_releases_tweet(self):
+        self.claim_returns({"_id": 1, "parts": ["a"]})
+        self.posted.find.return_value = FakeCursor(error=RuntimeError("boom"))
+
+        self.assertIsNone(await app.get_new_tweet())
+        self.assert_released(1)
+
+
+class PostTweetTest(ClaimTestCase):
+    def setUp(self):
+        super().setUp()
+        self.claim_returns({"_id": 1, "parts": ["a", "b"]})
+        self.client = MagicMock()
+        self.client.create_tweet = AsyncMock()
+
+        patcher = patch.object(app.asyncio, "sleep", AsyncMock())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_success_marks_posted(self):
+        self.client.create_tweet.side_effect = [
+            MagicMock(data={"id": "10"}),
+            MagicMock(data={"id": "11"}),
+        ]
+
+        await app.post_tweet(self.client)
+
+        self.assertEqual(
+            self.client.create_tweet.await_args.kwargs["in_reply_to_tweet_id"], "10"
+        )
+        self.assert_marked_posted(1)
+
+    async def test_image_attached_to_first_part_only(self):
+        self.claim_returns({"_id": 1, "parts": ["a", "b"], "image_id": "img"})
+        self.client.create_tweet.side_effect = [
+            MagicMock(data={"id": "10"}),
+            MagicMock(data={"id": "11"}),
+        ]
+
+        with patch.object(
+            app, "prepare_post_image", AsyncMock(return_value="m1")
+        ) as prepare:
+            await app.post_tweet(self.client)
+
+        prepare.assert_awaited_once_with("img")
+        first, second = self.client.create_tweet.await_args_list
+        self.assertEqual(first.kwargs["media_ids"], ["m1"])
+        self.assertNotIn("media_ids", second.kwargs)
+
+    async def test_image_skipped_without_parts(self):
+        self.claim_returns({"_id": 1, "parts": [], "image_id": "img"})
+
+        with patch.object(app, "prepare_post_image", AsyncMock()) as prepare:
+            await app.post_tweet(self.client)
+
+        prepare.assert_not_awaited()
+        self.client.create_tweet.assert_not_awaited()
+
+    async def test_failure_releases_tweet(self):
+        self.client.create_tweet.side_effect = RuntimeError("rate limited")
+
+        await app.post_tweet(self.client)
+
+        self.assertEqual(self.client.create_tweet.await_count, 3)
+        self.assert_released(1)
+
+
+class FakeResponse:
+    status = 201
+    reason = "Created"
+    headers = {}
+
+    async def read(self):
+        return b""
+
+    async def json(self):
+        return {"data": {"id": "10", "text": "a"}}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+
+class AuthV2SessionTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        patcher = patch.object(app, "_v2_client", None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def asyncTearDown(self):
+        await app.close_clients()
+
+    async def test_requests_reuse_one_session(self):
+        client = await app.auth_v2()
+        session = client.session
+        self.assertIsNotNone(session)
+
+        with patch.object(
+            session, "request", MagicMock(return_value=FakeResponse())
+        ) as request, patch(
+            "tweepy.asynchronous.client.aiohttp.ClientSession"
+        ) as new_session:
+            await client.create_tweet(text="a", user_auth=False)
+            await client.create_tweet(text="b", user_auth=False)
+
+        self.assertEqual(request.call_count, 2)
+        new_session.assert_not_called()
+        self.assertIs(client.session, session)
+        self.assertIs(await app.auth_v2(), client)
+
+    async def test_close_clients_closes_session(self):
+        session = (await app.auth_v2()).session
+
+        await app.close_clients()
+
+        self.assertTrue(session.closed)
+        self.assertIsNone(app._v2_client)
+
+
+if __name__ == "__main__":
+    unittest.main()